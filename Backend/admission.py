@@ -0,0 +1,79 @@
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+
+class Rejected(Exception):
+    """Raised when a request cannot be admitted; carries the HTTP status and Retry-After seconds."""
+
+    def __init__(self, message, status, retry_after):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Bound the number of concurrent heavy jobs and the number of requests waiting for one.
+
+    A request first takes a place in the queue (queued), which is where it
+    uploads and validates its video, and then waits for a job slot
+    (job_slot). At most max_concurrent + max_queue requests are admitted at
+    once; beyond that requests are rejected immediately with 429. Admitted
+    requests that do not get a job slot within queue_timeout seconds get 503.
+    """
+
+    def __init__(self, max_concurrent, max_queue, queue_timeout):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Lock()
+        self._admitted = 0
+        self._running = 0
+        # Moving average of job duration, used for Retry-After estimates
+        self._avg_job_seconds = 10.0
+
+    def retry_after(self):
+        """Seconds until a slot is likely to free up for a new request."""
+        with self._lock:
+            backlog = max(self._admitted - self._running, 0) + 1
+            return max(1, math.ceil(self._avg_job_seconds * backlog / self.max_concurrent))
+
+    def stats(self):
+        with self._lock:
+            return {'running': self._running, 'waiting': self._admitted - self._running,
+                    'avg_job_seconds': self._avg_job_seconds}
+
+    @contextmanager
+    def queued(self):
+        """Hold a place in the queue for the duration of the block, or raise Rejected (429)."""
+        with self._lock:
+            full = self._admitted >= self.max_concurrent + self.max_queue
+            if not full:
+                self._admitted += 1
+        if full:
+            raise Rejected('Server busy, too many queued requests', 429, self.retry_after())
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._admitted -= 1
+
+    @contextmanager
+    def job_slot(self):
+        """Hold a job slot for the duration of the block, or raise Rejected (503) on timeout."""
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            raise Rejected('Server busy, timed out waiting for a free worker', 503, self.retry_after())
+
+        with self._lock:
+            self._running += 1
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - start
+            with self._lock:
+                self._running -= 1
+                self._avg_job_seconds = 0.8 * self._avg_job_seconds + 0.2 * elapsed
+            self._slots.release()
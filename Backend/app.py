@@ -6,49 +6,105 @@ import os
 import tempfile
 from werkzeug.utils import secure_filename
 from final import prof, process_single_frame, detect_human_coordinates
-from flow_final import compare_exercise_sequences
+from flow_final import compare_exercise_sequences, prepare_sequence
+from admission import AdmissionController, Rejected
+from inference_runtime import MAX_CONCURRENT_JOBS
+from werkzeug.exceptions import RequestEntityTooLarge
 import time
+import threading
 import logging
 import traceback
 
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
+# Admission limits
+# MAX_CONCURRENT_JOBS (TRACKFIT_MAX_CONCURRENT_JOBS, default 1) is read by
+# inference_runtime, since it also sets each job's thread budget. Torch model
+# calls are serialized, so extra jobs only overlap mask comparison; scale out
+# with processes instead
+MAX_QUEUE_LENGTH = int(os.environ.get('TRACKFIT_MAX_QUEUE_LENGTH', 4))  # Requests waiting for a free job slot
+# A queued request waits behind up to MAX_QUEUE_LENGTH jobs; a shorter timeout
+# means it uploads its whole video only to get a 503
+EXPECTED_JOB_SECONDS = float(os.environ.get('TRACKFIT_EXPECTED_JOB_SECONDS', 120))
+QUEUE_TIMEOUT_SECONDS = float(os.environ.get('TRACKFIT_QUEUE_TIMEOUT_SECONDS',
+                                             EXPECTED_JOB_SECONDS * MAX_QUEUE_LENGTH / MAX_CONCURRENT_JOBS))
+MAX_UPLOAD_MB = float(os.environ.get('TRACKFIT_MAX_UPLOAD_MB', 50))
+MAX_VIDEO_SECONDS = float(os.environ.get('TRACKFIT_MAX_VIDEO_SECONDS', 60))
+DEBUG = os.environ.get('TRACKFIT_DEBUG', '0') == '1'
+PORT = int(os.environ.get('TRACKFIT_PORT', 5000))
+
 app = Flask(__name__)
+app.config['MAX_CONTENT_LENGTH'] = int(MAX_UPLOAD_MB * 1024 * 1024)
 CORS(app)
 
-# Add model initialization at startup rather than on first request
-prof_masks_cache = None
+admission = AdmissionController(MAX_CONCURRENT_JOBS, MAX_QUEUE_LENGTH, QUEUE_TIMEOUT_SECONDS)
+
+class InvalidVideo(ValueError):
+    pass
 
-# Initialize masks before handling requests
-@app.before_request
-def initialize_models():
-    global prof_masks_cache
-    logger.info("Pre-loading professor exercise masks...")
-    initialize_prof_masks('C:/Users/Karan/TE_mini_project/FastSAM/images/input_video.mp4')
+class VideoTooLong(ValueError):
+    pass
+
+PROF_VIDEO_PATH = 'C:/Users/Karan/TE_mini_project/FastSAM/images/input_video.mp4'
+
+# Professor masks (and their resized masks, features and flows) are computed
+# once, by the first admitted job; the lock keeps a cold-start burst from
+# running prof() once per request
+prof_masks_cache = None
+prof_sequence_cache = None
+prof_masks_lock = threading.Lock()
 
 def initialize_prof_masks(video_path):
-    global prof_masks_cache
-    if prof_masks_cache is None:
-        temp_dir = tempfile.mkdtemp()
-        try:
-            prof_masks_cache = prof(video_path, temp_dir)
-            print(f"Professor masks initialized. Total frames: {len(prof_masks_cache)}")
-        finally:
-            if os.path.exists(temp_dir):
-                for f in os.listdir(temp_dir):
-                    os.remove(os.path.join(temp_dir, f))
-                os.rmdir(temp_dir)
-
-def process_student_video(video_file):
+    global prof_masks_cache, prof_sequence_cache
+    with prof_masks_lock:
+        if prof_masks_cache is None:
+            logger.info("Loading professor exercise masks...")
+            temp_dir = tempfile.mkdtemp()
+            try:
+                prof_masks_cache = prof(video_path, temp_dir)
+                print(f"Professor masks initialized. Total frames: {len(prof_masks_cache)}")
+                if prof_masks_cache:
+                    prof_sequence_cache = prepare_sequence(prof_masks_cache, 'professor')
+            finally:
+                if os.path.exists(temp_dir):
+                    for f in os.listdir(temp_dir):
+                        os.remove(os.path.join(temp_dir, f))
+                    os.rmdir(temp_dir)
+
+def save_upload(video_file):
+    """Save the uploaded video to a temp file and check it can be read and is not too long"""
     temp_path = tempfile.mktemp(suffix='.webm')
     video_file.save(temp_path)
     
     cap = cv.VideoCapture(temp_path)
+    try:
+        if not cap.isOpened():
+            logger.error(f"Failed to open video file: {temp_path}")
+            raise InvalidVideo("Could not open video file. Unsupported format or corrupted file.")
+        if cap.get(cv.CAP_PROP_FRAME_COUNT) > max_video_frames(cap):
+            raise VideoTooLong(f"Video longer than {MAX_VIDEO_SECONDS:g} seconds")
+    except Exception:
+        cap.release()
+        os.remove(temp_path)
+        raise
+    cap.release()
+    return temp_path
+
+def max_video_frames(cap):
+    fps = cap.get(cv.CAP_PROP_FPS)
+    fps = fps if fps and fps > 0 else 30
+    return int(MAX_VIDEO_SECONDS * fps)
+
+def process_student_video(video_path):
+    cap = cv.VideoCapture(video_path)
     if not cap.isOpened():
-        logger.error(f"Failed to open video file: {temp_path}")
-        raise ValueError("Could not open video file. Unsupported format or corrupted file.")
+        logger.error(f"Failed to open video file: {video_path}")
+        raise InvalidVideo("Could not open video file. Unsupported format or corrupted file.")
         
+    # Frame count is unreliable for browser recordings (webm), so the limit
+    # checked in save_upload is enforced again while reading
+    max_frames = max_video_frames(cap)
     student_masks = []
     
     try:
@@ -56,6 +112,8 @@ def process_student_video(video_file):
             ret, frame = cap.read()
             if not ret:
                 break
+            if len(student_masks) >= max_frames:
+                raise VideoTooLong(f"Video longer than {MAX_VIDEO_SECONDS:g} seconds")
                 
             human_coords = detect_human_coordinates(frame)
             if human_coords:
@@ -66,53 +124,90 @@ def process_student_video(video_file):
                 student_masks.append(mask)
     finally:
         cap.release()
-        os.remove(temp_path)
     
     return student_masks
 
+def reject(message, status, retry_after=None):
+    response = jsonify({'error': message})
+    response.status_code = status
+    if retry_after is not None:
+        response.headers['Retry-After'] = str(retry_after)
+    return response
+
+@app.errorhandler(RequestEntityTooLarge)
+def upload_too_large(e):
+    return reject(f"Upload larger than {MAX_UPLOAD_MB:g} MB", 413)
+
 @app.route('/process-exercise', methods=['POST'])
 def process_exercise():
+    # Reject oversized uploads before reading the body
+    if request.content_length is not None and request.content_length > app.config['MAX_CONTENT_LENGTH']:
+        logger.warning(f"Rejected upload of {request.content_length} bytes")
+        return reject(f"Upload larger than {MAX_UPLOAD_MB:g} MB", 413)
+
     try:
         logger.debug("Received exercise processing request")
         
-        if 'video' not in request.files:
-            logger.error("No video file in request")
-            return jsonify({'error': 'No video file provided'}), 400
-        
-        video_file = request.files['video']
-        logger.debug(f"Received video: {video_file.filename}, {video_file.content_type}")
-        
-        # Process the video
-        student_masks = process_student_video(video_file)
-        logger.debug(f"Generated {len(student_masks)} student masks")
-        
-        # Initialize professor masks if needed
-        if prof_masks_cache is None:
-            logger.debug("Initializing professor masks")
-            initialize_prof_masks('C:/Users/Karan/TE_mini_project/FastSAM/images/input_video.mp4')
-        
-        if not student_masks or not prof_masks_cache:
-            logger.error("Failed to generate masks")
-            return jsonify({'error': 'Failed to process video'}), 500
+        # The upload is read and validated while queued, so slow clients do
+        # not hold a job slot
+        with admission.queued():
+            if 'video' not in request.files:
+                logger.error("No video file in request")
+                return jsonify({'error': 'No video file provided'}), 400
             
-        # Compare sequences
-        results = compare_exercise_sequences(prof_masks_cache, student_masks)
-        
-        response_data = {
-            'average_similarity': float(results.get('average_spatial_similarity', 0.0)),
-            'max_delay': int(results.get('max_delay', 0)),
-            'ideal_calories': float(results.get('ideal_calories', 0.0)),
-            'actual_calories': float(results.get('actual_calories', 0.0)),
-            'flow_similarity': float(results.get('average_flow_similarity', 0.0))
-        }
-        
-        logger.debug(f"Sending response: {response_data}")
-        return jsonify(response_data)
+            video_file = request.files['video']
+            logger.debug(f"Received video: {video_file.filename}, {video_file.content_type}")
+            video_path = save_upload(video_file)
+            
+            try:
+                with admission.job_slot():
+                    return run_exercise_job(video_path)
+            finally:
+                os.remove(video_path)
         
+    except Rejected as e:
+        logger.warning(f"Rejected request: {e} ({admission.stats()})")
+        return reject(str(e), e.status, e.retry_after)
+    except RequestEntityTooLarge:
+        raise
+    except VideoTooLong as e:
+        logger.warning(f"Rejected video: {e}")
+        return reject(str(e), 413)
+    except InvalidVideo as e:
+        logger.warning(f"Rejected video: {e}")
+        return reject(str(e), 400)
     except Exception as e:
         logger.error(f"Server error: {str(e)}")
         logger.error(traceback.format_exc())
         return jsonify({'error': str(e)}), 500
 
+def run_exercise_job(video_path):
+    # Initialize professor masks if needed
+    if prof_masks_cache is None:
+        initialize_prof_masks(PROF_VIDEO_PATH)
+    
+    # Process the video
+    student_masks = process_student_video(video_path)
+    logger.debug(f"Generated {len(student_masks)} student masks")
+    
+    if not student_masks or not prof_masks_cache:
+        logger.error("Failed to generate masks")
+        return jsonify({'error': 'Failed to process video'}), 500
+        
+    # Compare sequences
+    results = compare_exercise_sequences(prof_masks_cache, student_masks, prof_sequence=prof_sequence_cache)
+    
+    response_data = {
+        'average_similarity': float(results.get('average_spatial_similarity', 0.0)),
+        'max_delay': int(results.get('max_delay', 0)),
+        'ideal_calories': float(results.get('ideal_calories', 0.0)),
+        'actual_calories': float(results.get('actual_calories', 0.0)),
+        'flow_similarity': float(results.get('average_flow_similarity', 0.0))
+    }
+    
+    logger.debug(f"Sending response: {response_data}")
+    return jsonify(response_data)
+
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    # The debugger allows remote code execution and the reloader loads the models twice
+    app.run(debug=DEBUG, use_reloader=False, threaded=True, host='0.0.0.0', port=PORT)
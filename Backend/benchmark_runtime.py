@@ -0,0 +1,82 @@
+import os
+import time
+import argparse
+import cv2 as cv
+import numpy as np
+
+# Benchmark the PyTorch path as final.py runs it by default
+os.environ['TRACKFIT_BACKEND'] = 'torch'
+
+import final
+from flow_final import intersectionOverUnion
+from inference_runtime import onnx_model_paths, OnnxHumanDetector, OnnxSegmenter, INTRA_OP_THREADS, INTER_OP_THREADS
+
+
+def read_frames(video_path, max_frames):
+    """Read up to max_frames frames from a video."""
+    cap = cv.VideoCapture(video_path)
+    frames = []
+    while len(frames) < max_frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+
+def run_pipeline(name, detect, segment, frames, warmup=2):
+    """Time detection and segmentation per frame, returning masks and mean latencies in ms."""
+    for frame in frames[:warmup]:
+        coords = detect(frame)
+        if coords:
+            segment(frame, [coords[0]])
+
+    detect_times, segment_times, masks = [], [], []
+    for frame in frames:
+        start = time.perf_counter()
+        coords = detect(frame)
+        detect_times.append(time.perf_counter() - start)
+
+        if coords:
+            start = time.perf_counter()
+            mask = segment(frame, [coords[0]])
+            segment_times.append(time.perf_counter() - start)
+        else:
+            mask = np.zeros(frame.shape[:2], dtype=bool)
+        masks.append(np.asarray(mask).reshape(-1, *frame.shape[:2])[0])
+
+    detect_ms = 1000 * np.mean(detect_times)
+    segment_ms = 1000 * np.mean(segment_times) if segment_times else 0.0
+    print(f"{name:>12}: detect {detect_ms:8.1f} ms/frame, segment {segment_ms:8.1f} ms/frame, "
+          f"total {detect_ms + segment_ms:8.1f} ms/frame")
+    return masks
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare PyTorch and ONNX Runtime inference on CPU')
+    parser.add_argument('video', help='Video to read frames from')
+    parser.add_argument('--frames', type=int, default=20)
+    args = parser.parse_args()
+
+    frames = read_frames(args.video, args.frames)
+    print(f"Benchmarking {len(frames)} frames, intra-op threads={INTRA_OP_THREADS}, inter-op threads={INTER_OP_THREADS}")
+
+    torch_masks = run_pipeline('torch', final.detect_human_coordinates, final.process_single_frame, frames)
+
+    for quantize in (False, True):
+        yolo_path, fastsam_path = onnx_model_paths(quantize=quantize)
+        if not (os.path.exists(yolo_path) and os.path.exists(fastsam_path)):
+            print(f"Skipping {'onnx-int8' if quantize else 'onnx'}: run inference_runtime.py"
+                  f"{' --quantize' if quantize else ''} to export models")
+            continue
+        name = 'onnx-int8' if quantize else 'onnx'
+        onnx_masks = run_pipeline(name, OnnxHumanDetector(yolo_path), OnnxSegmenter(fastsam_path), frames)
+
+        # Agreement with the PyTorch masks
+        ious = [intersectionOverUnion(a, b) for a, b in zip(torch_masks, onnx_masks)]
+        print(f"{name:>12}: mean mask IoU vs torch {np.mean(ious):.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,6 @@
 import os
+import tempfile
+import threading
 import torch
 import cv2 as cv
 import time
@@ -8,17 +10,44 @@ from fastsam import FastSAM, FastSAMPrompt
 import numpy as np
 
 
+from inference_runtime import (configure_torch_threads, onnx_model_paths, OnnxHumanDetector, OnnxSegmenter,
+                               YOLO_WEIGHTS, FASTSAM_WEIGHTS)
+
+
 # Device Configuration
 DEVICE = 'cuda' if torch.cuda.is_available() else 'cpu'
 print(f"Using device: {DEVICE}")
 
-# Load Models
-yolo_model = YOLO('yolov8n.pt')  # YOLOv8 for human detection
-fastsam_model = FastSAM('./weights/FastSAM-x.pt')  # FastSAM for segmentation
-
+# Inference backend: 'torch' (default) or 'onnx' (CPU, ONNX Runtime)
+BACKEND = os.environ.get('TRACKFIT_BACKEND', 'torch')
+QUANTIZED = os.environ.get('TRACKFIT_QUANTIZED', '0') == '1'
+if BACKEND not in ('torch', 'onnx'):
+    raise ValueError(f"Unknown TRACKFIT_BACKEND {BACKEND!r}, expected 'torch' or 'onnx'")
+print(f"Using backend: {BACKEND}")
+
+if DEVICE == 'cpu':
+    configure_torch_threads()
+
+# Load Models (only those of the selected backend, to keep per-worker memory down)
+if BACKEND == 'torch':
+    yolo_model = YOLO(YOLO_WEIGHTS)  # YOLOv8 for human detection
+    fastsam_model = FastSAM(FASTSAM_WEIGHTS)  # FastSAM for segmentation
+else:
+    yolo_onnx_path, fastsam_onnx_path = onnx_model_paths(YOLO_WEIGHTS, FASTSAM_WEIGHTS, quantize=QUANTIZED)
+    onnx_detector = OnnxHumanDetector(yolo_onnx_path)
+    onnx_segmenter = OnnxSegmenter(fastsam_onnx_path)
+
+# The ultralytics/FastSAM predictors are not thread-safe, so torch model calls
+# from concurrent jobs in one process are serialized (ONNX Runtime sessions are)
+torch_model_lock = threading.Lock()
+
+@torch.inference_mode()
 def detect_human_coordinates(frame):
     """Detect human midpoints using YOLOv8 and return as list of points."""
-    results = yolo_model(frame, verbose=False)  # YOLO inference
+    if BACKEND == 'onnx':
+        return onnx_detector(frame)
+    with torch_model_lock:
+        results = yolo_model(frame, verbose=False)  # YOLO inference
     human_coords = []
 
     for result in results:
@@ -34,16 +63,27 @@ def detect_human_coordinates(frame):
 
     return human_coords
 
+@torch.inference_mode()
 def process_single_frame(frame, prompt_points):
     """Process a single frame using FastSAM with prompt points."""
-    temp_image_path = 'temp_frame.jpg'
+    if BACKEND == 'onnx':
+        try:
+            return onnx_segmenter(frame, prompt_points)
+        except Exception as e:
+            print(f"Error processing frame: {e}")
+            return np.zeros(frame.shape[:2], dtype=bool)  # Return empty mask on error
+
+    # Unique per call, so concurrent jobs never overwrite each other's frame
+    fd, temp_image_path = tempfile.mkstemp(suffix='.jpg')
+    os.close(fd)
     try:
         cv.imwrite(temp_image_path, frame)
-        # Perform FastSAM segmentation
-        everything_results = fastsam_model(temp_image_path, device=DEVICE, retina_masks=True, imgsz=1024, conf=0.2, iou=0.5)
-        prompt_process = FastSAMPrompt(temp_image_path, everything_results, device=DEVICE)
-        # Use prompt points for segmentation
-        ann = prompt_process.point_prompt(points=prompt_points, pointlabel=[1])
+        with torch_model_lock:
+            # Perform FastSAM segmentation
+            everything_results = fastsam_model(temp_image_path, device=DEVICE, retina_masks=True, imgsz=1024, conf=0.2, iou=0.5)
+            prompt_process = FastSAMPrompt(temp_image_path, everything_results, device=DEVICE)
+            # Use prompt points for segmentation
+            ann = prompt_process.point_prompt(points=prompt_points, pointlabel=[1])
         return ann
     except Exception as e:
         print(f"Error processing frame: {e}")
@@ -1,39 +1,15 @@
 import cv2 as cv
 import numpy as np
 from final import prof, process_camera_feed
-def compare_exercise_sequences(prof_masks, student_masks):
-    def extract_pose_features(mask):
-        # Convert boolean mask to uint8
-        mask_uint8 = mask.astype(np.uint8)
-        if mask_uint8.ndim == 3:
-            mask_uint8 = cv.cvtColor(mask_uint8, cv.COLOR_GRAY2RGB)
+from mask_descriptors import mask_descriptors, descriptor_features
 
-        
-        # Calculate moments
-        moments = cv.moments(mask_uint8)
-        
-        # Get centroid
-        if moments['m00'] != 0:
-            cx = moments['m10'] / moments['m00']
-            cy = moments['m01'] / moments['m00']
-        else:
-            cx, cy = 0, 0
-            
-        # Get contour features
-        contours, _ = cv.findContours(mask_uint8, cv.RETR_EXTERNAL, cv.CHAIN_APPROX_SIMPLE)
-        if contours:
-            main_contour = max(contours, key=cv.contourArea)
-            area = cv.contourArea(main_contour)
-            # Get bounding box height (useful for exercises like pullups)
-            _, _, _, height = cv.boundingRect(main_contour)
-        else:
-            area, height = 0, 0
-            
-        return np.array([cx, cy, area, height])
+# Whole-mask centroid, largest contour area and height (useful for exercises like pullups)
+POSE_FIELDS = ('mask_cx', 'mask_cy', 'area', 'height')
 
+def compare_exercise_sequences(prof_masks, student_masks):
     # Extract features from both sequences
-    prof_features = np.array([extract_pose_features(mask) for mask in prof_masks])
-    student_features = np.array([extract_pose_features(mask) for mask in student_masks])
+    prof_features = descriptor_features(mask_descriptors(prof_masks, whole_mask=True), POSE_FIELDS)
+    student_features = descriptor_features(mask_descriptors(student_masks, whole_mask=True), POSE_FIELDS)
     
     # Calculate DTW
     from scipy.spatial.distance import euclidean
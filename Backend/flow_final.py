@@ -2,6 +2,10 @@ import cv2 as cv
 import numpy as np
 from fastdtw import fastdtw
 from scipy.spatial.distance import euclidean
+from mask_descriptors import mask_descriptors, descriptor_features
+
+POSE_FIELDS = ('cx', 'cy', 'area', 'perimeter', 'aspect_ratio')
+TARGET_SIZE = (480, 480)
 
 def resize_mask(mask, target_size):
     """Resize mask to target size while preserving boolean type"""
@@ -12,53 +16,12 @@ def resize_mask(mask, target_size):
     resized = cv.resize(mask.astype(np.uint8), target_size, interpolation=cv.INTER_NEAREST)
     return resized.astype(bool)
 
-def extract_pose_features(mask):
-    """Extract pose features from mask"""
-    # Check mask type and shape
-    if not isinstance(mask, np.ndarray):
-        print(f"Error: mask is not a numpy array, it's a {type(mask)}")
-        return np.zeros(5)
-        
-    # Ensure mask is a single-channel binary image
-    if len(mask.shape) > 2:
-        print(f"Converting multi-channel mask with shape {mask.shape} to single channel")
-        mask = mask[:,:,0]  # Take first channel
-    
-    # Convert to uint8 (ensure binary)
-    mask_uint8 = mask.astype(np.uint8) * 255
-    
-    # Find contours
-    try:
-        contours, _ = cv.findContours(mask_uint8, cv.RETR_EXTERNAL, cv.CHAIN_APPROX_SIMPLE)
-    except Exception as e:
-        print(f"Error finding contours: {e}")
-        print(f"Mask shape: {mask.shape}, dtype: {mask.dtype}, unique values: {np.unique(mask)}")
-        return np.zeros(5)
-    
-    if not contours:
-        return np.zeros(5)  # Return zero features if no contours found
-        
-    # Get the largest contour
-    largest_contour = max(contours, key=cv.contourArea)
-    
-    # Calculate features
-    moments = cv.moments(largest_contour)
-    if moments['m00'] == 0:
-        return np.zeros(5)
-        
-    # Centroid
-    cx = moments['m10'] / moments['m00']
-    cy = moments['m01'] / moments['m00']
-    
-    # Area and perimeter
-    area = cv.contourArea(largest_contour)
-    perimeter = cv.arcLength(largest_contour, True)
-    
-    # Aspect ratio of bounding rect
-    x, y, w, h = cv.boundingRect(largest_contour)
-    aspect_ratio = float(w)/h if h != 0 else 0
-    
-    return np.array([cx, cy, area, perimeter, aspect_ratio])
+def extract_pose_features(descriptors):
+    """Pose features [cx, cy, area, perimeter, aspect_ratio] of the largest contour"""
+    features = descriptor_features(descriptors, POSE_FIELDS)
+    # Degenerate contours (zero area) carry no pose information
+    features[descriptors['area'] == 0] = 0
+    return features
 
 def calculate_flow(mask1, mask2):
     """Calculate optical flow between two consecutive masks"""
@@ -123,73 +86,64 @@ def calculate_calories(flow_metrics, duration_seconds, weight_kg=70):
     
     return calories_per_minute * minutes
 
-def compare_exercise_sequences(prof_masks, student_masks):
-    """Compare exercise sequences using both mask similarity and optical flow"""
+def prepare_masks(masks, target_size, label):
+    """Resize a mask sequence to target size, substituting empty masks on failure"""
+    processed_masks = []
+    for mask in masks:
+        try:
+            processed = resize_mask(mask, target_size)
+            processed_masks.append(processed)
+        except Exception as e:
+            print(f"Error processing {label} mask: {e}")
+            # Add empty mask if processing fails
+            processed_masks.append(np.zeros(target_size, dtype=bool))
+    return processed_masks
+
+def flow_metrics(mask1, mask2, label):
+    """Mean flow magnitude and angle between two masks"""
+    try:
+        magnitude, angle = calculate_flow(mask1, mask2)
+        return {
+            'mean_magnitude': np.mean(magnitude),
+            'mean_angle': np.mean(angle),
+        }
+    except Exception as e:
+        print(f"Error calculating {label} flow: {e}")
+        return {'mean_magnitude': 0.0, 'mean_angle': 0.0}
+
+def prepare_sequence(masks, label):
+    """Resized masks, pose features and flows of one sequence
+
+    The professor sequence does not change between requests, so it can be
+    prepared once and passed to compare_exercise_sequences as prof_sequence.
+    """
+    resized_masks = prepare_masks(masks, TARGET_SIZE, label)
+    return {
+        'masks': resized_masks,
+        'features': extract_pose_features(mask_descriptors(resized_masks)),
+        'flows': [flow_metrics(resized_masks[i-1], resized_masks[i], label) for i in range(1, len(resized_masks))],
+    }
+
+def compare_exercise_sequences(prof_masks, student_masks, prof_sequence=None):
+    """Compare exercise sequences using both mask similarity and optical flow
+
+    prof_sequence, from prepare_sequence(prof_masks, 'professor'), skips
+    re-resizing the professor masks and recomputing their features and flows.
+    """
     print(f"Comparing sequences: {len(prof_masks)} professor masks, {len(student_masks)} student masks")
     
     if not prof_masks or not student_masks:
         print("Warning: Empty mask sequences")
         return {'average_spatial_similarity': 0.0, 'max_delay': 0}
         
-    # Ensure masks are properly sized and formatted
-    target_size = (480, 480)
-    
-    # Process professor masks
-    processed_prof_masks = []
-    for mask in prof_masks:
-        try:
-            processed = resize_mask(mask, target_size)
-            processed_prof_masks.append(processed)
-        except Exception as e:
-            print(f"Error processing professor mask: {e}")
-            # Add empty mask if processing fails
-            processed_prof_masks.append(np.zeros(target_size, dtype=bool))
-    
-    # Process student masks
-    processed_student_masks = []
-    for mask in student_masks:
-        try:
-            processed = resize_mask(mask, target_size)
-            processed_student_masks.append(processed)
-        except Exception as e:
-            print(f"Error processing student mask: {e}")
-            processed_student_masks.append(np.zeros(target_size, dtype=bool))
+    if prof_sequence is None:
+        prof_sequence = prepare_sequence(prof_masks, 'professor')
+    student_sequence = prepare_sequence(student_masks, 'student')
     
     # Use processed masks
-    prof_masks = processed_prof_masks
-    student_masks = processed_student_masks
-    
-    # Extract features from each frame
-    prof_features = [extract_pose_features(mask) for mask in prof_masks]
-    student_features = [extract_pose_features(mask) for mask in student_masks]
-    
-    # Calculate flow between consecutive frames
-    prof_flows = []
-    student_flows = []
-    
-    # Calculate professor flows
-    for i in range(1, len(prof_masks)):
-        try:
-            magnitude, angle = calculate_flow(prof_masks[i-1], prof_masks[i])
-            prof_flows.append({
-                'mean_magnitude': np.mean(magnitude),
-                'mean_angle': np.mean(angle),
-            })
-        except Exception as e:
-            print(f"Error calculating professor flow: {e}")
-            prof_flows.append({'mean_magnitude': 0.0, 'mean_angle': 0.0})
-    
-    # Calculate student flows
-    for i in range(1, len(student_masks)):
-        try:
-            magnitude, angle = calculate_flow(student_masks[i-1], student_masks[i])
-            student_flows.append({
-                'mean_magnitude': np.mean(magnitude),
-                'mean_angle': np.mean(angle),
-            })
-        except Exception as e:
-            print(f"Error calculating student flow: {e}")
-            student_flows.append({'mean_magnitude': 0.0, 'mean_angle': 0.0})
+    prof_masks, student_masks = prof_sequence['masks'], student_sequence['masks']
+    prof_features, student_features = prof_sequence['features'], student_sequence['features']
+    prof_flows, student_flows = prof_sequence['flows'], student_sequence['flows']
     
     # Compare using DTW to handle different speeds
     distance, path = fastdtw(prof_features, student_features, dist=euclidean)
@@ -0,0 +1,232 @@
+import os
+import cv2 as cv
+import numpy as np
+
+
+# Runtime Configuration (per worker process)
+# TRACKFIT_WORKERS is the number of server processes sharing this box and
+# TRACKFIT_MAX_CONCURRENT_JOBS the jobs each one runs at once (see app.py);
+# every job gets cpu_count // (workers * jobs) intra-op threads unless set explicitly.
+WORKERS = max(1, int(os.environ.get('TRACKFIT_WORKERS', 1)))
+MAX_CONCURRENT_JOBS = max(1, int(os.environ.get('TRACKFIT_MAX_CONCURRENT_JOBS', 1)))
+INTRA_OP_THREADS = (int(os.environ.get('TRACKFIT_INTRA_OP_THREADS', 0))
+                    or max(1, (os.cpu_count() or 1) // (WORKERS * MAX_CONCURRENT_JOBS)))
+INTER_OP_THREADS = int(os.environ.get('TRACKFIT_INTER_OP_THREADS', 1))
+ONNX_DIR = os.environ.get('TRACKFIT_ONNX_DIR', './weights/onnx')
+
+YOLO_WEIGHTS = 'yolov8n.pt'
+FASTSAM_WEIGHTS = './weights/FastSAM-x.pt'
+
+YOLO_IMGSZ = 640
+FASTSAM_IMGSZ = 1024
+
+
+def configure_torch_threads(intra_op=INTRA_OP_THREADS, inter_op=INTER_OP_THREADS):
+    """Pin torch and OpenCV thread pools so several workers do not oversubscribe cores."""
+    import torch
+
+    torch.set_num_threads(intra_op)
+    try:
+        # Can only be set once, before any inter-op parallel work has started
+        torch.set_num_interop_threads(inter_op)
+    except RuntimeError as e:
+        print(f"Could not set inter-op threads: {e}")
+    cv.setNumThreads(intra_op)
+    print(f"Torch threads: intra-op={intra_op}, inter-op={inter_op}")
+
+
+def create_session(model_path, intra_op=INTRA_OP_THREADS, inter_op=INTER_OP_THREADS):
+    """Create a CPU ONNX Runtime session with explicit thread settings."""
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    options.intra_op_num_threads = intra_op
+    options.inter_op_num_threads = inter_op
+    options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    return ort.InferenceSession(model_path, sess_options=options, providers=['CPUExecutionProvider'])
+
+
+def export_onnx(model, imgsz, output_dir=ONNX_DIR):
+    """Export an ultralytics-based model (YOLO or FastSAM) to ONNX and return the file path."""
+    os.makedirs(output_dir, exist_ok=True)
+    exported_path = model.export(format='onnx', imgsz=imgsz, dynamic=False, simplify=True)
+    target_path = os.path.join(output_dir, os.path.basename(exported_path))
+    if os.path.abspath(exported_path) != os.path.abspath(target_path):
+        os.replace(exported_path, target_path)
+    return target_path
+
+
+def quantize_onnx(model_path):
+    """Apply dynamic int8 weight quantization and return the quantized model path."""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantized_path = model_path.replace('.onnx', '.int8.onnx')
+    quantize_dynamic(model_path, quantized_path, weight_type=QuantType.QUInt8)
+    return quantized_path
+
+
+def letterbox(frame, imgsz):
+    """Resize keeping aspect ratio and pad to a square input, as ultralytics does."""
+    h, w = frame.shape[:2]
+    scale = min(imgsz / h, imgsz / w)
+    new_w, new_h = int(round(w * scale)), int(round(h * scale))
+    pad_x, pad_y = (imgsz - new_w) / 2, (imgsz - new_h) / 2
+
+    resized = cv.resize(frame, (new_w, new_h), interpolation=cv.INTER_LINEAR)
+    top, left = int(round(pad_y - 0.1)), int(round(pad_x - 0.1))
+    padded = cv.copyMakeBorder(resized, top, imgsz - new_h - top, left, imgsz - new_w - left,
+                               cv.BORDER_CONSTANT, value=(114, 114, 114))
+
+    # BGR HWC uint8 -> RGB NCHW float32
+    blob = cv.dnn.blobFromImage(padded, scalefactor=1 / 255.0, swapRB=True)
+    return blob, scale, (left, top)
+
+
+def nms(boxes_xyxy, scores, conf, iou):
+    """Run NMS on xyxy boxes and return the kept indices."""
+    boxes_xywh = np.column_stack([boxes_xyxy[:, :2], boxes_xyxy[:, 2:] - boxes_xyxy[:, :2]])
+    keep = cv.dnn.NMSBoxes(boxes_xywh.tolist(), scores.tolist(), conf, iou)
+    return np.array(keep, dtype=int).reshape(-1)
+
+
+def scale_boxes(boxes, scale, pad, frame_shape):
+    """Map boxes from letterboxed model space back to frame pixels."""
+    boxes = boxes.copy()
+    boxes[:, [0, 2]] = (boxes[:, [0, 2]] - pad[0]) / scale
+    boxes[:, [1, 3]] = (boxes[:, [1, 3]] - pad[1]) / scale
+    boxes[:, [0, 2]] = boxes[:, [0, 2]].clip(0, frame_shape[1])
+    boxes[:, [1, 3]] = boxes[:, [1, 3]].clip(0, frame_shape[0])
+    return boxes
+
+
+def xywh_to_xyxy(xywh):
+    xyxy = np.empty_like(xywh)
+    xyxy[:, :2] = xywh[:, :2] - xywh[:, 2:] / 2
+    xyxy[:, 2:] = xywh[:, :2] + xywh[:, 2:] / 2
+    return xyxy
+
+
+class OnnxHumanDetector:
+    """YOLOv8 person detector running on ONNX Runtime."""
+
+    def __init__(self, model_path, conf=0.25, iou=0.7):
+        self.session = create_session(model_path)
+        self.input_name = self.session.get_inputs()[0].name
+        self.conf = conf
+        self.iou = iou
+
+    def __call__(self, frame):
+        """Return person box midpoints as [[x, y], ...], same as detect_human_coordinates."""
+        blob, scale, pad = letterbox(frame, YOLO_IMGSZ)
+        # (1, 4 + num_classes, num_anchors) -> (num_anchors, 4 + num_classes)
+        preds = self.session.run(None, {self.input_name: blob})[0][0].T
+
+        # Each anchor takes its best class, as ultralytics does; class 0 is 'person'
+        person_scores = preds[:, 4]
+        candidates = (preds[:, 4:].argmax(axis=1) == 0) & (person_scores > self.conf)
+        if not candidates.any():
+            return []
+
+        boxes = xywh_to_xyxy(preds[candidates, :4])
+        scores = person_scores[candidates]
+        keep = nms(boxes, scores, self.conf, self.iou)
+        boxes = scale_boxes(boxes[keep], scale, pad, frame.shape)
+
+        human_coords = []
+        for x1, y1, x2, y2 in boxes:
+            human_coords.append([int((x1 + x2) / 2), int((y1 + y2) / 2)])
+        return human_coords
+
+
+class OnnxSegmenter:
+    """FastSAM segmenter with point prompts running on ONNX Runtime."""
+
+    def __init__(self, model_path, conf=0.2, iou=0.5):
+        self.session = create_session(model_path)
+        self.input_name = self.session.get_inputs()[0].name
+        self.conf = conf
+        self.iou = iou
+
+    def __call__(self, frame, prompt_points):
+        """Return the union of masks containing the prompt points, shaped like FastSAMPrompt.point_prompt."""
+        h, w = frame.shape[:2]
+        onemask = np.zeros((h, w), dtype=bool)
+
+        blob, scale, pad = letterbox(frame, FASTSAM_IMGSZ)
+        preds, protos = self.session.run(None, {self.input_name: blob})
+        # preds: (1, 4 + 1 + 32, num_anchors), protos: (1, 32, mh, mw)
+        preds = preds[0].T
+        protos = protos[0]
+
+        scores = preds[:, 4]
+        candidates = scores > self.conf
+        if not candidates.any():
+            return np.array([onemask])
+
+        boxes = xywh_to_xyxy(preds[candidates, :4])
+        coeffs = preds[candidates, 5:]
+        keep = nms(boxes, scores[candidates], self.conf, self.iou)
+        boxes = scale_boxes(boxes[keep], scale, pad, frame.shape)
+        coeffs = coeffs[keep]
+
+        # Only masks whose box contains a prompt point can contain it, so
+        # decode those and skip full-resolution work for everything else
+        points = np.array(prompt_points, dtype=np.float32).reshape(-1, 2)
+        inside = ((boxes[:, None, 0] <= points[None, :, 0]) & (points[None, :, 0] <= boxes[:, None, 2]) &
+                  (boxes[:, None, 1] <= points[None, :, 1]) & (points[None, :, 1] <= boxes[:, None, 3])).any(axis=1)
+        if not inside.any():
+            return np.array([onemask])
+
+        c, mh, mw = protos.shape
+        masks = (coeffs[inside] @ protos.reshape(c, -1)).reshape(-1, mh, mw)
+
+        # Proto space -> letterboxed input -> original frame (retina masks)
+        ratio = mh / FASTSAM_IMGSZ
+        x0, y0 = int(round(pad[0] * ratio)), int(round(pad[1] * ratio))
+        x1, y1 = int(round(mw - pad[0] * ratio)), int(round(mh - pad[1] * ratio))
+        for mask, (bx1, by1, bx2, by2) in zip(masks, boxes[inside]):
+            # Logit > 0 is sigmoid > 0.5
+            mask = cv.resize(mask[y0:y1, x0:x1], (w, h), interpolation=cv.INTER_LINEAR) > 0
+            box_mask = np.zeros_like(mask)
+            box_mask[int(by1):int(np.ceil(by2)), int(bx1):int(np.ceil(bx2))] = True
+            mask &= box_mask
+            for px, py in points.astype(int):
+                if 0 <= py < h and 0 <= px < w and mask[py, px]:
+                    onemask |= mask
+                    break
+
+        return np.array([onemask])
+
+
+def export_models(yolo_weights=YOLO_WEIGHTS, fastsam_weights=FASTSAM_WEIGHTS, quantize=False):
+    """Export YOLO and FastSAM to ONNX (optionally int8) and return their paths."""
+    from ultralytics import YOLO
+    from fastsam import FastSAM
+
+    yolo_path = export_onnx(YOLO(yolo_weights), YOLO_IMGSZ)
+    fastsam_path = export_onnx(FastSAM(fastsam_weights), FASTSAM_IMGSZ)
+    if quantize:
+        yolo_path = quantize_onnx(yolo_path)
+        fastsam_path = quantize_onnx(fastsam_path)
+    print(f"Exported YOLO to {yolo_path}")
+    print(f"Exported FastSAM to {fastsam_path}")
+    return yolo_path, fastsam_path
+
+
+def onnx_model_paths(yolo_weights=YOLO_WEIGHTS, fastsam_weights=FASTSAM_WEIGHTS, quantize=False):
+    """Paths in ONNX_DIR of the models exported from the given weights."""
+    suffix = '.int8.onnx' if quantize else '.onnx'
+    return tuple(os.path.join(ONNX_DIR, os.path.splitext(os.path.basename(weights))[0] + suffix)
+                 for weights in (yolo_weights, fastsam_weights))
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Export YOLO and FastSAM to ONNX')
+    parser.add_argument('--yolo', default=YOLO_WEIGHTS)
+    parser.add_argument('--fastsam', default=FASTSAM_WEIGHTS)
+    parser.add_argument('--quantize', action='store_true', help='Also apply dynamic int8 quantization')
+    args = parser.parse_args()
+    export_models(args.yolo, args.fastsam, quantize=args.quantize)
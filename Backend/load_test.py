@@ -0,0 +1,151 @@
+import io
+import os
+import sys
+import time
+import types
+import argparse
+import tempfile
+import threading
+import contextlib
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+import cv2 as cv
+import numpy as np
+
+
+def busy_work(ms, alloc_mb):
+    """Keep a core busy for ms milliseconds while holding alloc_mb of memory, like a model forward pass."""
+    activations = np.ones(int(alloc_mb * 1024 * 1024 / 8))
+    end = time.perf_counter() + ms / 1000
+    total = 0
+    while time.perf_counter() < end:
+        # Pure Python arithmetic holds the GIL, so jobs contend like CPU inference does
+        for i in range(1000):
+            total += i * i
+    return activations[:1].sum() + total
+
+
+def install_stub_models(detect_ms, segment_ms, alloc_mb, prof_frames=20):
+    """Register a stand-in for final.py whose models burn CPU and memory, so no weights are needed."""
+    stub = types.ModuleType('final')
+
+    def detect_human_coordinates(frame):
+        busy_work(detect_ms, alloc_mb)
+        return [[frame.shape[1] // 2, frame.shape[0] // 2]]
+
+    def process_single_frame(frame, prompt_points):
+        busy_work(segment_ms, alloc_mb)
+        mask = np.zeros(frame.shape[:2], dtype=bool)
+        x, y = prompt_points[0]
+        mask[max(0, y - 40):y + 40, max(0, x - 20):x + 20] = True
+        return mask
+
+    def prof(input_video_path, temp_frame_folder, fps=3):
+        frame = np.zeros((240, 320, 3), dtype=np.uint8)
+        return [process_single_frame(frame, [[160 + i, 120]]) for i in range(prof_frames)]
+
+    stub.detect_human_coordinates = detect_human_coordinates
+    stub.process_single_frame = process_single_frame
+    stub.prof = prof
+    sys.modules['final'] = stub
+
+
+def make_video(num_frames, fps=10):
+    """Write a small synthetic video and return its bytes."""
+    path = tempfile.mktemp(suffix='.avi')
+    writer = cv.VideoWriter(path, cv.VideoWriter_fourcc(*'MJPG'), fps, (320, 240))
+    for i in range(num_frames):
+        frame = np.zeros((240, 320, 3), dtype=np.uint8)
+        cv.rectangle(frame, (100 + 2 * i, 60), (160 + 2 * i, 200), (255, 255, 255), -1)
+        writer.write(frame)
+    writer.release()
+    with open(path, 'rb') as f:
+        data = f.read()
+    os.remove(path)
+    return data
+
+
+def upload(url, video_bytes):
+    """POST a video as multipart form data; return (status, latency seconds)."""
+    boundary = 'trackfit-load-test'
+    body = (f'--{boundary}\r\nContent-Disposition: form-data; name="video"; filename="video.avi"\r\n'
+            f'Content-Type: video/x-msvideo\r\n\r\n').encode() + video_bytes + f'\r\n--{boundary}--\r\n'.encode()
+    req = urllib.request.Request(url, data=body, headers={'Content-Type': f'multipart/form-data; boundary={boundary}'})
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    return status, time.perf_counter() - start
+
+
+def run_level(url, video_bytes, max_jobs, max_queue, concurrency, num_requests):
+    """Fire num_requests uploads from `concurrency` clients and return a report row."""
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda _: upload(url, video_bytes), range(num_requests)))
+    elapsed = time.perf_counter() - start
+
+    ok = np.array([latency for status, latency in results if status == 200])
+    statuses = [status for status, _ in results]
+    p50, p95, p99 = np.percentile(ok, [50, 95, 99]) * 1000 if len(ok) else (0.0, 0.0, 0.0)
+    return (f"{max_jobs:>4} | {max_queue:>5} | {concurrency:>7} | {len(ok) / elapsed:7.2f} | "
+            f"{p50:8.0f} | {p95:8.0f} | {p99:8.0f} | "
+            f"{statuses.count(200):>4} | {statuses.count(429):>4} | {statuses.count(503):>4} | "
+            f"{len(statuses) - statuses.count(200) - statuses.count(429) - statuses.count(503):>5}")
+
+
+def parse_levels(value):
+    return [int(v) for v in value.split(',')]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay concurrent uploads against app.py with stub models')
+    parser.add_argument('--concurrency', default='1,4,16', help='Comma-separated client concurrency levels')
+    parser.add_argument('--max-jobs', default='1,2,4', help='Comma-separated MAX_CONCURRENT_JOBS settings')
+    parser.add_argument('--max-queue', default='2,8', help='Comma-separated MAX_QUEUE_LENGTH settings')
+    parser.add_argument('--queue-timeout', type=float, default=10, help='QUEUE_TIMEOUT_SECONDS for every setting')
+    parser.add_argument('--requests', type=int, default=32, help='Requests per run')
+    parser.add_argument('--frames', type=int, default=20, help='Frames per uploaded video')
+    parser.add_argument('--detect-ms', type=float, default=5, help='CPU time per detection')
+    parser.add_argument('--segment-ms', type=float, default=20, help='CPU time per segmentation')
+    parser.add_argument('--alloc-mb', type=float, default=50, help='Memory held per model call')
+    parser.add_argument('--port', type=int, default=5055)
+    args = parser.parse_args()
+
+    install_stub_models(args.detect_ms, args.segment_ms, args.alloc_mb)
+
+    import logging
+    import app as server
+    from werkzeug.serving import make_server
+
+    logging.disable(logging.WARNING)
+    httpd = make_server('127.0.0.1', args.port, server.app, threaded=True)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+
+    url = f'http://127.0.0.1:{args.port}/process-exercise'
+    video_bytes = make_video(args.frames)
+    print(f"{args.requests} requests per run, queue timeout={args.queue_timeout:g}s, "
+          f"stub models {args.detect_ms:g}+{args.segment_ms:g} ms CPU and {args.alloc_mb:g} MB per frame")
+    print(f"{'jobs':>4} | {'queue':>5} | {'clients':>7} | {'req/s':>7} | {'p50 ms':>8} | {'p95 ms':>8} | "
+          f"{'p99 ms':>8} | {'200':>4} | {'429':>4} | {'503':>4} | {'other':>5}")
+
+    # The comparison code prints per-frame detail from server threads; keep the report readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        upload(url, video_bytes)  # Warm up (loads the stub professor masks once)
+    for max_jobs in parse_levels(args.max_jobs):
+        for max_queue in parse_levels(args.max_queue):
+            for concurrency in parse_levels(args.concurrency):
+                server.admission = server.AdmissionController(max_jobs, max_queue, args.queue_timeout)
+                with contextlib.redirect_stdout(io.StringIO()):
+                    row = run_level(url, video_bytes, max_jobs, max_queue, concurrency, args.requests)
+                print(row)
+
+    httpd.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+import cv2 as cv
+import numpy as np
+from numpy.lib.recfunctions import structured_to_unstructured
+
+# One row per mask. mask_* fields use moments of the whole mask, the rest
+# describe the largest external contour.
+DESCRIPTOR_DTYPE = np.dtype([
+    ('mask_cx', np.float64),
+    ('mask_cy', np.float64),
+    ('cx', np.float64),
+    ('cy', np.float64),
+    ('area', np.float64),
+    ('perimeter', np.float64),
+    ('width', np.float64),
+    ('height', np.float64),
+    ('aspect_ratio', np.float64),
+])
+
+
+def to_binary_mask(mask):
+    """Return a 2D uint8 (0/1) mask, taking the first channel of multi-channel masks."""
+    if len(mask.shape) > 2:
+        mask = mask[:, :, 0]
+    return (mask > 0).astype(np.uint8)
+
+
+def mask_descriptors(masks, whole_mask=False):
+    """Compute all mask geometry in a single pass per mask.
+
+    Contours are found once per mask and every contour feature is derived
+    from that one result. The whole-mask centroid (mask_cx, mask_cy) costs a
+    second pass over the pixels, so it is only computed when whole_mask is
+    set. Masks are converted one at a time, so peak memory stays at one
+    extra mask however long the sequence is.
+    """
+    descriptors = np.zeros(len(masks), dtype=DESCRIPTOR_DTYPE)
+    for i, mask in enumerate(masks):
+        if not isinstance(mask, np.ndarray):
+            print(f"Error: mask is not a numpy array, it's a {type(mask)}")
+            continue
+        binary_mask = to_binary_mask(mask)
+        row = descriptors[i]
+
+        if whole_mask:
+            moments = cv.moments(binary_mask)
+            if moments['m00'] != 0:
+                row['mask_cx'] = moments['m10'] / moments['m00']
+                row['mask_cy'] = moments['m01'] / moments['m00']
+
+        # Largest-contour features; contour moments give the area (m00) and
+        # the centroid in one call, so contourArea is never needed
+        contours, _ = cv.findContours(binary_mask, cv.RETR_EXTERNAL, cv.CHAIN_APPROX_SIMPLE)
+        if not contours:
+            continue
+        contour_moments = [cv.moments(contour) for contour in contours]
+        largest = int(np.argmax([m['m00'] for m in contour_moments]))
+        moments = contour_moments[largest]
+
+        _, _, w, h = cv.boundingRect(contours[largest])
+        if moments['m00'] != 0:
+            row['cx'] = moments['m10'] / moments['m00']
+            row['cy'] = moments['m01'] / moments['m00']
+        row['area'] = moments['m00']
+        row['perimeter'] = cv.arcLength(contours[largest], True)
+        row['width'] = w
+        row['height'] = h
+        row['aspect_ratio'] = float(w) / h if h != 0 else 0
+
+    return descriptors
+
+
+def descriptor_features(descriptors, fields):
+    """Select fields from descriptors as a plain (num_masks, len(fields)) float array."""
+    return structured_to_unstructured(descriptors[list(fields)])